@@ -1,24 +1,30 @@
+import functools
 import io
-import textwrap
+import logging
 import re  
+from types import SimpleNamespace
 
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-import json
-from openai import OpenAI
+import asyncio
+import orjson
+import queue
+import random
+import threading
+import time
 
-# Updated imports for the PDF generation
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+# openai and reportlab are imported lazily inside the functions that use
+# them, so the first page render doesn't wait on loading them.
+
+
+logger = logging.getLogger(__name__)
 
 
 # ------------- CONFIG AND QUESTIONS -------------
 
-CC_QUESTIONS = [
+CC_QUESTIONS = (
     "Scope of change",
     "Number of impacted employees",
     "Variation in groups that are impacted",
@@ -31,9 +37,9 @@ CC_QUESTIONS = [
     "Impact on employee compensation",
     "Reduction in total staffing levels",
     "Timeframe for change",
-]
+)
 
-OA_QUESTIONS = [
+OA_QUESTIONS = (
     "Perceived need for change among employees and managers",
     "Impact of past changes on employees",
     "Change capacity (how much else is changing)",
@@ -46,9 +52,9 @@ OA_QUESTIONS = [
     "Senior management change competency",
     "Middle management change competency",
     "Employee change competency",
-]
+)
 
-GROUP_ASPECTS = [
+GROUP_ASPECTS = (
     "Processes",
     "Systems",
     "Tools",
@@ -59,22 +65,435 @@ GROUP_ASPECTS = [
     "Performance reviews",
     "Compensation",
     "Location",
-]
+)
+
+# Columns of the group impact table built by compute_group_impact
+GROUP_COLUMNS = (
+    "Group name",
+    "Employees",
+    "Aspects impacted (out of 10)",
+    "Degree of impact (0-5)",
+)
+
+# ------------- AI CHANGE PLAN PROMPT -------------
+
+# Kept byte-identical across calls (and over 1024 tokens) so OpenAI's
+# automatic prompt caching can reuse it; only the user message (a TASK line
+# plus the JSON payload) varies.
+# UPDATED PROMPT: Explicitly forbids ASCII tables to prevent PDF formatting issues
+CHANGE_PLAN_SYSTEM_MSG = (
+    "You are an expert change management consultant using the Prosci methodology. "
+    "You specialize in translating change impact assessments into practical, "
+    "role-based change plans for complex organizations.\n\n"
+    "IMPORTANT FORMATTING RULES:\n"
+    "1. Do NOT use Markdown tables (ASCII tables with | and -). They break the PDF rendering.\n"
+    "2. Instead of tables, use clear bulleted lists or grouped text sections.\n"
+    "3. Use '### ' (triple hash) for your Section Headers so we can style them.\n"
+    "4. Do not use HTML tags like <br>.\n\n"
+    "YOUR TASK:\n"
+    "Each user message starts with a TASK line followed by change impact assessment data in JSON. "
+    "The full change plan is assembled from one OVERVIEW response plus one GROUP response per impacted group.\n"
+    "- TASK: OVERVIEW. Create a concise, high-level change plan for the change as a whole. It should:\n"
+    "  - Summarize the overall change and key drivers.\n"
+    "  - Highlight which groups are most impacted and how (Use a list, not a table).\n"
+    "  - Organize organization-wide tactics into phases (for example: Awareness, Desire, Knowledge, Ability, Reinforcement).\n"
+    "  - Be written so that a project sponsor or change manager could use it to guide planning.\n"
+    "  Tailored tactics for each group are written separately, so do not add a section per group.\n"
+    "- TASK: GROUP. Write only the plan section for the single group in the data. Start with a '### ' header "
+    "naming the group, then recommend tailored change tactics for that group based on its impact level, "
+    "organized by phase. Do not repeat the overall summary or discuss other groups.\n\n"
+    "HOW TO READ THE DATA:\n"
+    "The JSON object has three keys: project_info, oa_impacts and either group_impacts (OVERVIEW) or group (GROUP).\n"
+    "- project_info holds the project name, the primary sponsor, the organization or department, "
+    "the person who completed the assessment and a short free-text description of the change. "
+    "Any of these fields may be empty; never invent values for empty fields and do not mention that they are missing.\n"
+    "- group_impacts is a list with one entry per impacted group (it may be null if no groups were entered); "
+    "group is a single such entry. Each entry has a row number ('#'), a 'Group name', the number of 'Employees' in the group, "
+    "'Aspects impacted (out of 10)' and 'Degree of impact (0-5)'. "
+    "The ten aspects assessed for every group are: processes, systems, tools, job role, critical behaviors, "
+    "mindset / attitude / beliefs, reporting structure, performance reviews, compensation and location. "
+    "Each aspect is scored from 0 (no impact) to 5 (extremely high impact). "
+    "'Aspects impacted' counts the aspects scored above 0, and 'Degree of impact' is the sum of the ten "
+    "aspect scores divided by 50 and multiplied by 5, so it is also on a 0 to 5 scale.\n"
+    "- oa_impacts describes the Organizational Attributes of the organization. 'summary' gives the total score, "
+    "the maximum possible score and the percent of maximum. 'details' lists each of the twelve attributes with "
+    "its score from 1 (low risk, more favorable) to 5 (high risk, less favorable).\n\n"
+    "THE ASSESSMENT:\n"
+    "The data comes from a Prosci Impact Index assessment completed by the person named in project_info. "
+    "The assessor entered the project details, scored the Organizational Attributes of the organization as a whole, "
+    "and then, for each group of employees affected by the change, entered a group name, an employee count and "
+    "a score for each of the ten aspects. Group rows that were left completely empty are not included, so the "
+    "row numbers may have gaps; a row number always identifies the same group slot that the assessor filled in.\n\n"
+    "THE ORGANIZATIONAL ATTRIBUTES:\n"
+    "oa_impacts.details lists these twelve attributes in this order, each with its 'id', 'question' and 'score':\n"
+    + "".join(f"{i}. {q}\n" for i, q in enumerate(OA_QUESTIONS, start=1))
+    + "The 'percent_of_max' value in the summary is the total score divided by the maximum possible score "
+    "(twelve attributes times 5), expressed as a percentage.\n\n"
+    "THE GROUP ASPECTS:\n"
+    "Each group's degree of impact is built from its scores on these ten aspects of how people work:\n"
+    "- Processes: the steps and workflows people follow to do their work.\n"
+    "- Systems: the software applications and technology platforms people use.\n"
+    "- Tools: the equipment, devices and other physical or digital tools people use.\n"
+    "- Job role: the responsibilities and tasks that make up a person's job.\n"
+    "- Critical behaviors: the specific actions people must perform for the change to succeed.\n"
+    "- Mindset / Attitude / Beliefs: how people think about their work and the organization.\n"
+    "- Reporting structure: who people report to and who reports to them.\n"
+    "- Performance reviews: how people's performance is measured and evaluated.\n"
+    "- Compensation: how people are paid, including salary, bonuses and benefits.\n"
+    "- Location: where people do their work.\n"
+    "The individual aspect scores are not included in the data; only the count of impacted aspects "
+    "and the overall degree of impact are.\n\n"
+    "THE ADKAR PHASES:\n"
+    "The Prosci ADKAR model describes the five outcomes an individual needs to achieve for a change to succeed:\n"
+    "- Awareness of the need for change.\n"
+    "- Desire to participate in and support the change.\n"
+    "- Knowledge of how to change.\n"
+    "- Ability to implement the required skills and behaviors.\n"
+    "- Reinforcement to sustain the change.\n\n"
+    "STYLE:\n"
+    "Write in clear, plain business English for a sponsor or change manager. Prefer short paragraphs and bullets. "
+    "Refer to groups by their 'Group name' (or by their row number if the name is empty). "
+    "Do not restate the raw JSON, do not show calculations, and do not ask follow-up questions; "
+    "produce the complete response for the requested TASK in a single reply."
+)
+
+
+PLAN_MODEL = "gpt-4.1-mini"
+PLAN_TEMPERATURE = 0.4
+
+# Generated plans are reused for identical inputs for this long (seconds),
+# keeping at most PLAN_CACHE_MAX_ENTRIES plans per server process.
+PLAN_CACHE_TTL = 3600
+PLAN_CACHE_MAX_ENTRIES = 128
+
+# Opt-in reuse of plans for near-identical inputs: payload embeddings with a
+# cosine similarity at or above the threshold count as a hit. Only the most
+# recent PLAN_SIMILARITY_CACHE_SIZE plans per session are compared.
+EMBEDDING_MODEL = "text-embedding-3-small"
+PLAN_SIMILARITY_THRESHOLD = 0.97
+PLAN_SIMILARITY_CACHE_SIZE = 20
+
+# Per-request timeout (seconds) for OpenAI API calls.
+OPENAI_TIMEOUT = 60.0
+
+# Maximum number of plan requests (overview + per-group sections) in flight at once.
+PLAN_MAX_CONCURRENCY = 10
+
+# Retry policy for transient OpenAI failures (rate limits, 5xx, dropped connections).
+OPENAI_MAX_ATTEMPTS = 5
+OPENAI_MAX_BACKOFF = 20.0
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
 
 
 # ------------- HELPER FUNCTIONS -------------
 
-def generate_change_plan_with_gpt(project_info, group_impacts, oa_impacts=None):
+@st.cache_resource
+def get_openai_client():
+    """
+    Shared synchronous OpenAI client for the Batch API (file upload, batch
+    create/retrieve). Unlike AsyncOpenAI it isn't tied to an event loop.
+    """
+    from openai import OpenAI
+
+    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"], timeout=OPENAI_TIMEOUT)
+
+
+@st.cache_resource
+def get_plan_runtime():
+    """
+    Process-wide (event loop, AsyncOpenAI client) pair for plan generation.
+    The loop runs forever in a daemon thread and the client's connection
+    pool is bound to it, so every plan request from every session reuses the
+    same warm keep-alive connections instead of a new TLS handshake.
+    Coroutines are submitted with run_plan_coroutine.
+    """
+    from openai import AsyncOpenAI
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="openai-plan-loop", daemon=True).start()
+    # Retries are handled by create_with_backoff, not the client.
+    client = AsyncOpenAI(api_key=st.secrets["OPENAI_API_KEY"], timeout=OPENAI_TIMEOUT, max_retries=0)
+    return loop, client
+
+
+def run_plan_coroutine(fn, *args, placeholder=None):
+    """
+    Run the coroutine fn(client, *args, on_text=...) on the shared plan loop
+    and return its result.
+    Text passed to on_text is rendered into placeholder from this (the
+    script) thread, since the loop thread has no script run context; only
+    the latest text is drawn when several arrive at once. Each render is
+    also where a rerun interrupts a superseded run, and the coroutine is
+    then cancelled instead of being left running on the loop.
+    """
+    loop, client = get_plan_runtime()
+    updates = queue.SimpleQueue()
+    future = asyncio.run_coroutine_threadsafe(fn(client, *args, on_text=updates.put), loop)
+    try:
+        while not future.done():
+            try:
+                text = updates.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            while not updates.empty():
+                text = updates.get_nowait()
+            if on_text is not None:
+                on_text(text)
+        return future.result()
+    finally:
+        future.cancel()
+
+
+async def create_with_backoff(client, create=None, **kwargs):
+    """
+    await create(**kwargs), retried with exponential backoff plus jitter on
+    rate limits, 5xx responses and connection errors. create defaults to
+    client.chat.completions.create.
+    Other errors, and the last failed attempt, are raised to the caller.
+    """
+    from openai import APIConnectionError, APIStatusError
+
+    if create is None:
+        create = client.chat.completions.create
+    for attempt in range(OPENAI_MAX_ATTEMPTS):
+        try:
+            return await create(**kwargs)
+        except (APIStatusError, APIConnectionError) as e:
+            retryable = (
+                isinstance(e, APIConnectionError)
+                or e.status_code in RETRYABLE_STATUS_CODES
+            )
+            if not retryable or attempt == OPENAI_MAX_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(min(2 ** attempt + random.random(), OPENAI_MAX_BACKOFF))
+
+
+@st.cache_resource
+def _change_plan_memo():
+    """
+    Process-wide {payload_json: (created_at, plan)} memo of generated plans,
+    with the lock that guards it (sessions run on separate threads).
+    A plain dict instead of st.cache_data because the plan is streamed into
+    a placeholder created outside the function, which cache_data can't replay.
+    """
+    return {}, threading.Lock()
+
+
+def _memoized_plan(payload_json):
+    """Plan memoized for payload_json, or None if absent or expired."""
+    memo, lock = _change_plan_memo()
+    with lock:
+        cached = memo.get(payload_json)
+    if cached and time.time() - cached[0] < PLAN_CACHE_TTL:
+        return cached[1]
+    return None
+
+
+def _memoize_plan(payload_json, plan):
+    """
+    Store plan for payload_json, dropping expired entries and then the
+    oldest ones beyond PLAN_CACHE_MAX_ENTRIES.
+    """
+    memo, lock = _change_plan_memo()
+    now = time.time()
+    with lock:
+        for key in [k for k, (created_at, _) in memo.items() if now - created_at >= PLAN_CACHE_TTL]:
+            del memo[key]
+        # Re-insert so the dict stays ordered oldest first
+        memo.pop(payload_json, None)
+        memo[payload_json] = (now, plan)
+        while len(memo) > PLAN_CACHE_MAX_ENTRIES:
+            del memo[next(iter(memo))]
+
+
+def _compact_json(data):
+    """Compact, key-sorted JSON text (orjson: UTF-8, no whitespace by default)."""
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()
+
+
+def _plan_messages(task, data):
+    """Chat messages for one plan request: the constant system prompt, then TASK + JSON."""
+    # Compact, key-sorted JSON keeps prompt tokens down.
+    data_json = _compact_json(data)
+    return [
+        {"role": "system", "content": CHANGE_PLAN_SYSTEM_MSG},
+        {"role": "user", "content": f"TASK: {task}\nHere is the structured data (JSON):\n{data_json}"},
+    ]
+
+
+def _impacted_groups(group_impacts):
+    """Groups that get their own plan section (degree of impact above 0)."""
+    return [g for g in (group_impacts or []) if g["Degree of impact (0-5)"] > 0]
+
+
+def _missing_group_section(group, reason):
+    """Placeholder section for a group whose plan request failed."""
+    label = group["Group name"] or f"Group {group['#']}"
+    return f"### {label}\nThe plan section for this group could not be generated ({reason})."
+
+
+async def _stream_plan_overview(client, semaphore, payload, on_text=None):
+    """Stream the OVERVIEW part of the plan, passing the text so far to on_text."""
+    async with semaphore:
+        stream = await create_with_backoff(
+            client,
+            model=PLAN_MODEL,
+            messages=_plan_messages("OVERVIEW", payload),
+            temperature=PLAN_TEMPERATURE,
+            stream=True,
+        )
+        # A new click reruns the script and cancels this coroutine at the
+        # next placeholder update; closing the stream cancels the superseded
+        # request instead of leaving it to finish in the background.
+        text = ""
+        try:
+            async for event in stream:
+                if not event.choices:
+                    continue
+                text += event.choices[0].delta.content or ""
+                if on_text is not None:
+                    on_text(text)
+        finally:
+            await stream.close()
+    return text
+
+
+async def _plan_for_group(client, semaphore, project_info, group, oa_impacts):
+    """Return the GROUP plan section for a single impacted group."""
+    data = {
+        "project_info": project_info,
+        "group": group,
+        "oa_impacts": oa_impacts,
+    }
+    async with semaphore:
+        response = await create_with_backoff(
+            client,
+            model=PLAN_MODEL,
+            messages=_plan_messages("GROUP", data),
+            temperature=PLAN_TEMPERATURE,
+        )
+    return response.choices[0].message.content or ""
+
+
+async def _generate_change_plan(client, payload, on_text=None):
+    """
+    Generate the overview and one section per impacted group concurrently
+    and join them into a single plan.
+    Returns (plan, complete); complete is False if any group section failed.
+    """
+    impacted_groups = _impacted_groups(payload["group_impacts"])
+    semaphore = asyncio.Semaphore(PLAN_MAX_CONCURRENCY)
+
+    group_tasks = [
+        asyncio.create_task(
+            _plan_for_group(client, semaphore, payload["project_info"], g, payload["oa_impacts"])
+        )
+        for g in impacted_groups
+    ]
+    try:
+        # Awaited on its own so an overview failure (or a rerun interrupting
+        # the stream) propagates at once.
+        overview = await _stream_plan_overview(client, semaphore, payload, on_text)
+
+        # Report progress as group sections finish. Each placeholder update
+        # is also where a rerun interrupts a superseded run, which the group
+        # requests alone (no Streamlit calls) would never reach.
+        pending = set(group_tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if on_text is not None:
+                on_text(
+                    f"{overview}\n\n_Group sections: {len(group_tasks) - len(pending)} "
+                    f"of {len(group_tasks)} done…_"
+                )
+        group_results = await asyncio.gather(*group_tasks, return_exceptions=True)
+    finally:
+        # Unfinished group requests (overview failed, or the run was
+        # interrupted) are cancelled rather than left running.
+        for task in group_tasks:
+            task.cancel()
+        await asyncio.gather(*group_tasks, return_exceptions=True)
+
+    sections = [overview]
+    complete = True
+    for g, result in zip(impacted_groups, group_results):
+        if isinstance(result, Exception):
+            complete = False
+            result = _missing_group_section(g, result)
+        sections.append(result)
+    return "\n\n".join(sections), complete
+
+
+async def _embed_text(client, text):
+    """Embedding vector for text as a float32 array."""
+    response = await create_with_backoff(
+        client, client.embeddings.create, model=EMBEDDING_MODEL, input=text
+    )
+    return np.asarray(response.data[0].embedding, dtype=np.float32)
+
+
+def _find_similar_plan(plan_cache, embedding):
+    """
+    Plan from plan_cache (a session's [(embedding, plan)] list) whose payload
+    embedding is most similar to embedding, if the cosine similarity reaches
+    PLAN_SIMILARITY_THRESHOLD; otherwise None.
+    """
+    if not plan_cache:
+        return None
+
+    embeddings = np.stack([cached_embedding for cached_embedding, _ in plan_cache])
+    similarity = embeddings @ embedding / (
+        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(embedding)
+    )
+    best = int(np.argmax(similarity))
+    if similarity[best] >= PLAN_SIMILARITY_THRESHOLD:
+        return plan_cache[best][1]
+    return None
+
+
+async def _similar_or_new_plan(client, payload, payload_json, plan_cache, on_text=None):
+    """
+    Reuse a plan from plan_cache for near-identical inputs, or generate one.
+    plan_cache is None when similarity reuse is off. Embedding, lookup and
+    generation share one coroutine so a cache miss costs a single run on
+    the shared client.
+    Returns (plan, complete, embedding, reused); embedding is None if the
+    similarity check was skipped or failed.
+    """
+    embedding = None
+    if plan_cache is not None:
+        # The similarity check is only an optimization: if the embedding
+        # can't be fetched, generate the plan as usual.
+        try:
+            embedding = await _embed_text(client, payload_json)
+        except Exception:
+            logger.warning("Plan similarity check failed; generating a new plan.", exc_info=True)
+        if embedding is not None:
+            similar_plan = _find_similar_plan(plan_cache, embedding)
+            if similar_plan:
+                return similar_plan, True, embedding, True
+
+    plan, complete = await _generate_change_plan(client, payload, on_text)
+    return plan, complete, embedding, False
+
+
+def generate_change_plan_with_gpt(project_info, group_impacts, oa_impacts=None, placeholder=None, reuse_similar=False):
     """
     Call the OpenAI API to generate a high-level change plan
     based on project info and impact variations.
+    The overview is streamed; if a placeholder (st.empty()) is given, it is
+    rendered there as tokens arrive. Sections for each impacted group are
+    requested concurrently and appended once they finish.
+    Plans are memoized on the canonical JSON of the inputs for PLAN_CACHE_TTL.
+    With reuse_similar, a plan generated earlier in the session for
+    near-identical inputs (by payload embedding similarity) is returned
+    instead of generating a new one.
+    Returns (plan, reused); plan is None on failure, and reused is True when
+    a plan for near-identical inputs was returned.
     """
-    api_key = st.secrets.get("OPENAI_API_KEY")
-    if not api_key:
+    if not st.secrets.get("OPENAI_API_KEY"):
         st.error("OpenAI API key is not configured. Please set OPENAI_API_KEY in Streamlit secrets.")
-        return None
-
-    client = OpenAI(api_key=api_key)
+        return None, False
 
     payload = {
         "project_info": project_info,
@@ -82,132 +501,313 @@ def generate_change_plan_with_gpt(project_info, group_impacts, oa_impacts=None):
         "oa_impacts": oa_impacts,
     }
 
-    # UPDATED PROMPT: Explicitly forbids ASCII tables to prevent PDF formatting issues
-    system_msg = (
-        "You are an expert change management consultant using the Prosci methodology. "
-        "You specialize in translating change impact assessments into practical, "
-        "role-based change plans for complex organizations.\n\n"
-        "IMPORTANT FORMATTING RULES:\n"
-        "1. Do NOT use Markdown tables (ASCII tables with | and -). They break the PDF rendering.\n"
-        "2. Instead of tables, use clear bulleted lists or grouped text sections.\n"
-        "3. Use '### ' (triple hash) for your Section Headers so we can style them.\n"
-        "4. Do not use HTML tags like <br>."
-    )
+    # Compact, key-sorted JSON: a stable memo key regardless of dict ordering.
+    payload_json = _compact_json(payload)
 
-    user_msg = (
-        "Using the following change impact assessment data, create a concise, high-level change plan. "
-        "The plan should:\n"
-        "- Summarize the overall change and key drivers.\n"
-        "- Highlight which groups are most impacted and how (Use a list, not a table).\n"
-        "- Recommend tailored change tactics for each group based on their impact level.\n"
-        "- Organize tactics into phases (for example: Awareness, Desire, Knowledge, Ability, Reinforcement).\n"
-        "- Be written so that a project sponsor or change manager could use it to guide planning.\n\n"
-        f"Here is the structured data (JSON):\n{json.dumps(payload, indent=2)}"
-    )
+    cached_plan = _memoized_plan(payload_json)
+    if cached_plan:
+        return cached_plan, False
+
+    # Read here: the coroutine runs on the plan loop thread, which has no
+    # access to this session's state.
+    plan_cache = st.session_state.setdefault("plan_cache", []) if reuse_similar else None
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini", 
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_msg},
-            ],
-            temperature=0.4,
+        plan, complete, embedding, reused = run_plan_coroutine(
+            _similar_or_new_plan, payload, payload_json, plan_cache, placeholder=placeholder
         )
-        return response.choices[0].message.content
     except Exception as e:
         st.error(f"Error calling OpenAI API: {e}")
+        return None, False
+
+    if complete and not reused:
+        _memoize_plan(payload_json, plan)
+        if embedding is not None:
+            plan_cache.append((embedding, plan))
+            del plan_cache[:-PLAN_SIMILARITY_CACHE_SIZE]
+    return plan, reused
+
+def submit_change_plan_batch(project_info, group_impacts, oa_impacts=None):
+    """
+    Queue the overview and per-group plan requests as one OpenAI Batch API
+    job (half the cost of live calls, finished within 24 hours).
+    Returns {"id": batch_id, "groups": [...]} to keep in session_state for
+    collect_change_plan_batch, or None if submission failed.
+    """
+    if not st.secrets.get("OPENAI_API_KEY"):
+        st.error("OpenAI API key is not configured. Please set OPENAI_API_KEY in Streamlit secrets.")
         return None
 
-def compute_cc_score(cc_answers):
+    payload = {
+        "project_info": project_info,
+        "group_impacts": group_impacts,
+        "oa_impacts": oa_impacts,
+    }
+    impacted_groups = _impacted_groups(group_impacts)
+    plan_requests = [("overview", "OVERVIEW", payload)] + [
+        (
+            f"group-{g['#']}",
+            "GROUP",
+            {"project_info": project_info, "group": g, "oa_impacts": oa_impacts},
+        )
+        for g in impacted_groups
+    ]
+    batch_input = b"\n".join(
+        orjson.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": PLAN_MODEL,
+                "messages": _plan_messages(task, data),
+                "temperature": PLAN_TEMPERATURE,
+            },
+        })
+        for custom_id, task, data in plan_requests
+    )
+
+    try:
+        client = get_openai_client()
+        input_file = client.files.create(
+            file=("change_plan_batch.jsonl", batch_input),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+    except Exception as e:
+        st.error(f"Error submitting OpenAI batch: {e}")
+        return None
+
+    return {"id": batch.id, "groups": impacted_groups}
+
+
+def _batch_error_message(result):
+    """Error message for a failed line of a batch output or error file."""
+    body = (result.get("response") or {}).get("body") or {}
+    error = result.get("error") or body.get("error") or {}
+    return error.get("message") or "batch request failed"
+
+
+def collect_change_plan_batch(batch_job):
+    """
+    Check a queued plan batch. Returns (status, plan, error); plan is None
+    until the batch has completed, then the sections are joined in submission
+    order. error is set instead of plan when the overview request failed.
+    """
+    client = get_openai_client()
+    batch = client.batches.retrieve(batch_job["id"])
+    if batch.status != "completed":
+        return batch.status, None, None
+
+    # Output lines come back in arbitrary order; match them by custom_id.
+    # Failed requests are listed in the error file, or in the output file
+    # with an error body.
+    sections = {}
+    errors = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            body = (result.get("response") or {}).get("body") or {}
+            if body.get("choices"):
+                sections[result["custom_id"]] = body["choices"][0]["message"]["content"] or ""
+            else:
+                errors[result["custom_id"]] = _batch_error_message(result)
+
+    # Like the live path, a plan without its overview is a failure
+    if not sections.get("overview"):
+        return batch.status, None, errors.get("overview", "no overview was returned")
+
+    plan = [sections["overview"]]
+    for g in batch_job["groups"]:
+        custom_id = f"group-{g['#']}"
+        plan.append(
+            sections.get(custom_id)
+            or _missing_group_section(g, errors.get(custom_id, "batch request failed"))
+        )
+    return batch.status, "\n\n".join(plan), None
+
+
+def score_editor(items, item_label, default, min_value, max_value, key):
+    """
+    Render a single editable grid of (item, score) rows and return the
+    scores as a tuple of ints in the same order as items.
+    One st.data_editor replaces a slider per item, so a section costs one
+    widget instead of len(items) widgets on every rerun.
+    """
+    df = pd.DataFrame({
+        item_label: list(items),
+        "Score": [default] * len(items),
+    })
+    df.index = range(1, len(df) + 1)
+
+    edited = st.data_editor(
+        df,
+        column_config={
+            "Score": st.column_config.NumberColumn(
+                min_value=min_value,
+                max_value=max_value,
+                step=1,
+                required=True,
+            ),
+        },
+        disabled=[item_label],
+        width="stretch",
+        key=key,
+    )
+    return tuple(int(v) for v in edited["Score"])
+
+
+def compute_cc_score(cc_scores):
     """Sum scores for Change Characteristics and compute percentage."""
-    total = sum(cc_answers.values())
-    max_score = len(cc_answers) * 5
+    total = sum(cc_scores)
+    max_score = len(cc_scores) * 5
     percent = (total / max_score * 100) if max_score > 0 else 0
     return total, max_score, percent
 
 
-def compute_oa_score(oa_answers):
+def compute_oa_score(oa_scores):
     """Sum scores for Organizational Attributes and compute percentage."""
-    total = sum(oa_answers.values())
-    max_score = len(oa_answers) * 5
+    total = sum(oa_scores)
+    max_score = len(oa_scores) * 5
     percent = (total / max_score * 100) if max_score > 0 else 0
     return total, max_score, percent
 
 
-def compute_group_impact(groups_data):
+@st.cache_data(show_spinner=False)
+def _high_impact(questions, scores, threshold=3):
+    """Questions whose score is at or above threshold, in question order."""
+    return tuple(q for q, score in zip(questions, scores) if score >= threshold)
+
+
+@st.cache_data(show_spinner=False)
+def compute_group_impact(groups_data, include_empty=False):
     """
     For each group:
       - count of aspects with score > 0
       - degree of impact on a 0–5 scale, matching the Excel formula:
         IF(SUM(G:P)>0, (SUM(G:P)/50)*5, 0)
+    Computed for all groups at once on a (groups x aspects) score matrix;
+    each group's aspect_scores are already in GROUP_ASPECTS order.
+    Unless include_empty is set, groups with no name and no impact scores
+    are left out so the table, exports and PDF skip unused group slots;
+    the '#' index stays the group's slot number either way.
     """
-    results = []
-    for g in groups_data:
-        scores = [g["aspects"].get(a, 0) for a in GROUP_ASPECTS]
-        total_score = sum(scores)
-        aspects_impacted = sum(1 for s in scores if s > 0)
-        if total_score > 0:
-            degree_impact = (total_score / 50.0) * 5.0
-        else:
-            degree_impact = 0.0
-
-        results.append({
-            "Group name": g["name"],
-            "Employees": g["employees"],
-            "Aspects impacted (out of 10)": aspects_impacted,
-            "Degree of impact (0-5)": round(degree_impact, 1), # Rounded to nearest 10th
-        })
-
-    if not results:
+    if not groups_data:
         return pd.DataFrame()
 
-    df = pd.DataFrame(results)
-    # Make the row index start at 1 instead of 0 for display
-    df.index = range(1, len(df) + 1)
+    scores = np.array(
+        [g["aspect_scores"] for g in groups_data],
+        dtype=np.int8,
+    )
+    total_scores = scores.sum(axis=1)
+    aspects_impacted = (scores > 0).sum(axis=1)
+    degree_impact = np.where(total_scores > 0, (total_scores / 50.0) * 5.0, 0.0)
+
+    df = pd.DataFrame({
+        "Group name": [g["name"] for g in groups_data],
+        "Employees": [g["employees"] for g in groups_data],
+        "Aspects impacted (out of 10)": aspects_impacted,
+        "Degree of impact (0-5)": np.round(degree_impact, 1), # Rounded to nearest 10th
+    })
+
+    # Number rows by their group slot (1-based, matching "Group N" in the
+    # inputs), so '#' keeps pointing at the same group after empty slots
+    # are dropped.
+    df.index = np.arange(1, len(df) + 1)
     df.index.name = "#"
+
+    if not include_empty:
+        named = np.array([bool(g["name"].strip()) for g in groups_data], dtype=bool)
+        df = df[named | (total_scores > 0)]
     return df
 
-def style_impact_table(df: pd.DataFrame):
+def format_impact_table(df: pd.DataFrame):
     """
-    Style a DataFrame with:
-      - black background
-      - blue borders
-      - pink text
-      - Number formatting (1 decimal place)
+    Display copy of a group impact table with the degree of impact shown to
+    1 decimal place (e.g., 3.0). Colors and borders come from the global
+    [data-testid="stTable"] CSS, so no pandas Styler is needed.
     """
-    # Define the blue border string for reuse
-    blue_border = "1px solid #06AFE6"
-    
-    return (
-        df.style
-        .format({"Degree of impact (0-5)": "{:.1f}"})  # Force 1 decimal place (e.g., 3.0)
-        .set_properties(**{
-            "background-color": "#000000",
-            "color": "#DA10AB",           # Pink text
-            "border": blue_border,        # Blue border
-        })
-        .set_table_styles([
-            {
-                "selector": "th", 
-                "props": [
-                    ("background-color", "#000000"), 
-                    ("color", "#DA10AB"), 
-                    ("border", blue_border)
-                ]
-            },
-            {
-                "selector": "tr", 
-                "props": [("background-color", "#000000")]
-            },
-            {
-                "selector": "td", 
-                "props": [("border", blue_border)]
-            }
-        ])
+    return df.assign(**{
+        "Degree of impact (0-5)": df["Degree of impact (0-5)"].map("{:.1f}".format),
+    })
+
+
+# Patterns for turning AI plan Markdown into ReportLab paragraph markup
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_STRIP_BR = re.compile(r'<br\s*/?>')
+_HEADER_RE = re.compile(r'^#{2,}\s*(.*)$')
+_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+
+@functools.lru_cache(maxsize=1)
+def _rl():
+    """
+    Import ReportLab on first use and return the names the PDF builders need,
+    so app startup doesn't pay for it and later calls cost nothing.
+    """
+    # Updated imports for the PDF generation
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    return SimpleNamespace(
+        colors=colors,
+        letter=letter,
+        getSampleStyleSheet=getSampleStyleSheet,
+        ParagraphStyle=ParagraphStyle,
+        inch=inch,
+        SimpleDocTemplate=SimpleDocTemplate,
+        Paragraph=Paragraph,
+        Spacer=Spacer,
+        Table=Table,
+        TableStyle=TableStyle,
     )
 
 
+@functools.lru_cache(maxsize=1)
+def _pdf_styles():
+    """
+    Paragraph styles shared by both PDF builders, created once per process.
+    Theme: Blue headings, black body text, pink table text.
+    """
+    rl = _rl()
+    styles = rl.getSampleStyleSheet()
+    return SimpleNamespace(
+        # Custom Heading (Blue #06AFE6)
+        title=rl.ParagraphStyle(
+            'TitleCustom', 
+            parent=styles['Heading1'], 
+            textColor=rl.colors.HexColor("#06AFE6"),
+            spaceAfter=12
+        ),
+        h2=rl.ParagraphStyle(
+            'Heading2Custom', 
+            parent=styles['Heading2'], 
+            textColor=rl.colors.HexColor("#06AFE6"),
+            spaceBefore=12, 
+            spaceAfter=6
+        ),
+        # Normal Text (Black for readability on white paper)
+        normal=styles['Normal'],
+        # Pink Text for Table Content
+        pink=rl.ParagraphStyle(
+            'PinkText',
+            parent=styles['Normal'],
+            textColor=rl.colors.HexColor("#DA10AB")
+        ),
+    )
+
+
+@st.cache_data(show_spinner=False)
 def build_pdf_summary(
     project_name,
     sponsor_name,
@@ -220,182 +820,166 @@ def build_pdf_summary(
     oa_total,
     oa_max,
     oa_pct,
-    cc_answers,
-    oa_answers,
-    group_df,
+    cc_scores,
+    oa_scores,
+    group_rows,
 ):
     """
     Build a PDF summary using ReportLab Platypus for proper tables and styling.
     Theme: White background, Blue Headings, Pink Table Text, Blue Borders.
+
+    Cached on its inputs: cc_scores / oa_scores are tuples of scores in
+    question order, group_rows is a tuple of (name, employees, aspects
+    impacted, degree of impact) rows, and the PDF is returned as bytes so
+    reruns with unchanged inputs are free.
     """
+
+    rl = _rl()
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc = rl.SimpleDocTemplate(buffer, pagesize=rl.letter)
     story = []
     
     # --- Styles ---
-    styles = getSampleStyleSheet()
-    
-    # Custom Heading (Blue #06AFE6)
-    title_style = ParagraphStyle(
-        'TitleCustom', 
-        parent=styles['Heading1'], 
-        textColor=colors.HexColor("#06AFE6"),
-        spaceAfter=12
-    )
-    h2_style = ParagraphStyle(
-        'Heading2Custom', 
-        parent=styles['Heading2'], 
-        textColor=colors.HexColor("#06AFE6"),
-        spaceBefore=12, 
-        spaceAfter=6
-    )
-    
-    # Normal Text (Black for readability on white paper)
-    normal_style = styles['Normal']
-    
-    # Pink Text for Table Content
-    pink_text_style = ParagraphStyle(
-        'PinkText',
-        parent=styles['Normal'],
-        textColor=colors.HexColor("#DA10AB")
-    )
+    styles = _pdf_styles()
+    title_style = styles.title
+    h2_style = styles.h2
+    normal_style = styles.normal
+    pink_text_style = styles.pink
     
     # --- Content ---
     
     # Title
-    story.append(Paragraph("Change Impact Assessment – Summary", title_style))
+    story.append(rl.Paragraph("Change Impact Assessment – Summary", title_style))
     
     # 1. Project Info
-    story.append(Paragraph("1. Project information", h2_style))
+    story.append(rl.Paragraph("1. Project information", h2_style))
     
-    # Helper to add bold label + text
-    def add_info_line(label, value):
-        if value:
-            text = f"<b>{label}</b> {value}"
-            story.append(Paragraph(text, normal_style))
-            story.append(Spacer(1, 4))
-
-    add_info_line("Project:", project_name)
-    add_info_line("Organization / Dept:", org_name)
-    add_info_line("Sponsor:", sponsor_name)
-    add_info_line("Assessment completed by:", assessment_owner)
+    # Bold label + text lines, joined into one Paragraph (fewer flowables to lay out)
+    info_lines = [
+        f"<b>{label}</b> {value}"
+        for label, value in (
+            ("Project:", project_name),
+            ("Organization / Dept:", org_name),
+            ("Sponsor:", sponsor_name),
+            ("Assessment completed by:", assessment_owner),
+        )
+        if value
+    ]
+    if info_lines:
+        story.append(rl.Paragraph("<br/>".join(info_lines), normal_style))
     
     if project_desc:
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("<b>Change description:</b>", normal_style))
-        story.append(Paragraph(project_desc, normal_style))
+        story.append(rl.Spacer(1, 6))
+        story.append(rl.Paragraph("<b>Change description:</b>", normal_style))
+        story.append(rl.Paragraph(project_desc, normal_style))
 
-    story.append(Spacer(1, 12))
+    story.append(rl.Spacer(1, 12))
 
     # 2. Change Characteristics
-    story.append(Paragraph("2. Change Characteristics (CC)", h2_style))
-    story.append(Paragraph(f"<b>Total Score:</b> {cc_total} / {cc_max} ({cc_pct:.1f}%)", normal_style))
+    story.append(rl.Paragraph("2. Change Characteristics (CC)", h2_style))
+    story.append(rl.Paragraph(f"<b>Total Score:</b> {cc_total} / {cc_max} ({cc_pct:.1f}%)", normal_style))
     
     # CC High Impact
-    cc_high = [q for i, q in enumerate(CC_QUESTIONS, 1) if cc_answers.get(f"CC_{i}", 0) >= 3]
+    cc_high = _high_impact(CC_QUESTIONS, cc_scores)
     if cc_high:
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("<b>High impact areas (Score 3+):</b>", normal_style))
-        for item in cc_high:
-            story.append(Paragraph(f"• {item}", normal_style))
+        story.append(rl.Spacer(1, 6))
+        story.append(rl.Paragraph(
+            "<br/>".join(["<b>High impact areas (Score 3+):</b>"] + [f"• {item}" for item in cc_high]),
+            normal_style,
+        ))
     else:
-        story.append(Paragraph("No items scored 3 or above.", normal_style))
+        story.append(rl.Paragraph("No items scored 3 or above.", normal_style))
 
     # 3. Organizational Attributes
-    story.append(Paragraph("3. Organizational Attributes (OA)", h2_style))
-    story.append(Paragraph(f"<b>Total Score:</b> {oa_total} / {oa_max} ({oa_pct:.1f}%)", normal_style))
+    story.append(rl.Paragraph("3. Organizational Attributes (OA)", h2_style))
+    story.append(rl.Paragraph(f"<b>Total Score:</b> {oa_total} / {oa_max} ({oa_pct:.1f}%)", normal_style))
     
     # OA High Impact
-    oa_high = [q for i, q in enumerate(OA_QUESTIONS, 1) if oa_answers.get(f"OA_{i}", 0) >= 3]
+    oa_high = _high_impact(OA_QUESTIONS, oa_scores)
     if oa_high:
-        story.append(Spacer(1, 6))
-        story.append(Paragraph("<b>High risk areas (Score 3+):</b>", normal_style))
-        for item in oa_high:
-            story.append(Paragraph(f"• {item}", normal_style))
+        story.append(rl.Spacer(1, 6))
+        story.append(rl.Paragraph(
+            "<br/>".join(["<b>High risk areas (Score 3+):</b>"] + [f"• {item}" for item in oa_high]),
+            normal_style,
+        ))
     else:
-        story.append(Paragraph("No items scored 3 or above.", normal_style))
+        story.append(rl.Paragraph("No items scored 3 or above.", normal_style))
         
-    story.append(Spacer(1, 12))
+    story.append(rl.Spacer(1, 12))
 
     # 4. Group Impact Summary (THE TABLE)
-    story.append(Paragraph("4. Group Impact Summary", h2_style))
+    story.append(rl.Paragraph("4. Group Impact Summary", h2_style))
     
-    if group_df is not None and not group_df.empty:
+    if group_rows:
         # Construct Table Data
+        # Plain strings are drawn directly; only the Group Name column stays a
+        # Paragraph so long names can wrap. Color and bold come from the TableStyle.
         # Headers
-        table_data = [[
-            Paragraph("<b>Group Name</b>", pink_text_style),
-            Paragraph("<b>Employees</b>", pink_text_style),
-            Paragraph("<b>Aspects (10)</b>", pink_text_style),
-            Paragraph("<b>Impact (0-5)</b>", pink_text_style)
-        ]]
+        table_data = [["Group Name", "Employees", "Aspects (10)", "Impact (0-5)"]]
         
         # Rows
-        for _, row in group_df.iterrows():
-            # Round impact to 1 decimal
-            impact_val = f"{row['Degree of impact (0-5)']:.1f}"
-            
+        for name, employees, aspects, degree in group_rows:
             row_data = [
-                Paragraph(str(row['Group name']), pink_text_style),
-                Paragraph(str(row['Employees']), pink_text_style),
-                Paragraph(str(row['Aspects impacted (out of 10)']), pink_text_style),
-                Paragraph(impact_val, pink_text_style)
+                rl.Paragraph(str(name), pink_text_style),
+                str(employees),
+                str(aspects),
+                f"{degree:.1f}"  # Round impact to 1 decimal
             ]
             table_data.append(row_data)
         
         # Create Table
         # Adjust col widths as needed
-        t = Table(table_data, colWidths=[3.0*inch, 1.0*inch, 1.2*inch, 1.2*inch])
+        t = rl.Table(table_data, colWidths=[3.0*rl.inch, 1.0*rl.inch, 1.2*rl.inch, 1.2*rl.inch])
         
         # Apply the "Webpage Look" (White BG, Pink Text, Blue Grid)
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.white),       # White Background
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#06AFE6")), # Blue Borders
+        t.setStyle(rl.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), rl.colors.white),       # White Background
+            ('TEXTCOLOR', (0, 0), (-1, -1), rl.colors.HexColor("#DA10AB")), # Pink Text
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),      # Bold Headers
+            ('GRID', (0, 0), (-1, -1), 1, rl.colors.HexColor("#06AFE6")), # Blue Borders
             ('VALIGN', (0, 0), (-1, -1), 'TOP'),
             ('ALIGN', (1, 0), (-1, -1), 'CENTER'),                # Center numbers
         ]))
         
         story.append(t)
     else:
-        story.append(Paragraph("No group data entered.", normal_style))
+        story.append(rl.Paragraph("No group data entered.", normal_style))
         
     # Build
     doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
+@st.cache_data(show_spinner=False)
 def build_change_plan_pdf(project_info, plan_text):
     """
     Build a PDF for the AI Change Plan.
     Theme: White background, Blue Headings.
     Parses Markdown headers (###) into real PDF styles.
+    Cached on the project info and plan text; returns the PDF as bytes.
     """
+    rl = _rl()
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc = rl.SimpleDocTemplate(buffer, pagesize=rl.letter)
     story = []
     
     # --- Styles ---
-    styles = getSampleStyleSheet()
-    
-    # Blue Headings
-    title_style = ParagraphStyle('TitleCustom', parent=styles['Heading1'], textColor=colors.HexColor("#06AFE6"), spaceAfter=12)
-    h2_style = ParagraphStyle('Heading2Custom', parent=styles['Heading2'], textColor=colors.HexColor("#06AFE6"), spaceBefore=12, spaceAfter=6)
-    
-    # Normal Text
-    normal_style = styles['Normal']
+    styles = _pdf_styles()
+    title_style = styles.title
+    h2_style = styles.h2
+    normal_style = styles.normal
     
     # --- Content ---
-    story.append(Paragraph("AI-Generated Change Plan", title_style))
+    story.append(rl.Paragraph("AI-Generated Change Plan", title_style))
     
     # Project Info
-    story.append(Paragraph("Project Information", h2_style))
+    story.append(rl.Paragraph("Project Information", h2_style))
     if project_info:
         if project_info.get("project_name"):
-            story.append(Paragraph(f"<b>Project:</b> {project_info['project_name']}", normal_style))
+            story.append(rl.Paragraph(f"<b>Project:</b> {project_info['project_name']}", normal_style))
         if project_info.get("sponsor_name"):
-            story.append(Paragraph(f"<b>Sponsor:</b> {project_info['sponsor_name']}", normal_style))
+            story.append(rl.Paragraph(f"<b>Sponsor:</b> {project_info['sponsor_name']}", normal_style))
             
-    story.append(Spacer(1, 12))
+    story.append(rl.Spacer(1, 12))
     
     # The Plan Content Parsing
     # We don't add a hardcoded header here because the AI usually provides its own headers.
@@ -410,38 +994,49 @@ def build_change_plan_pdf(project_info, plan_text):
                 continue
 
             # 1. Clean up <br> tags and XML characters
-            clean_line = line.replace('<br>', '').replace('<br/>', '').replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            
-            # 2. Check for Markdown Headers (### Header)
-            if clean_line.startswith('###'):
-                # Strip the hashtags and whitespace
-                header_text = clean_line.replace('#', '').strip()
-                # Add as a Styled Heading
-                story.append(Paragraph(header_text, h2_style))
+            clean_line = _STRIP_BR.sub('', line).translate(_ESCAPE)
             
-            # 3. Check for Markdown Headers (## Header) - just in case
-            elif clean_line.startswith('##'):
-                header_text = clean_line.replace('#', '').strip()
-                story.append(Paragraph(header_text, h2_style))
+            # 2. Markdown Headers (### Header, or ## just in case) -> Styled Heading
+            header = _HEADER_RE.match(clean_line)
+            if header:
+                story.append(rl.Paragraph(header.group(1), h2_style))
 
-            # 4. Standard Text
+            # 3. Standard Text with Bold Formatting (text is already escaped,
+            #    so the only markup is the balanced <b></b> pairs added here)
             else:
-                # Apply Bold Formatting safely (Regex)
-                formatted_text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', clean_line)
-                
-                try:
-                    story.append(Paragraph(formatted_text, normal_style))
-                except Exception:
-                    story.append(Paragraph(clean_line, normal_style))
+                story.append(rl.Paragraph(_BOLD_RE.sub(r'<b>\1</b>', clean_line), normal_style))
                 
                 # Add a small spacer after paragraphs for readability
-                story.append(Spacer(1, 6))
+                story.append(rl.Spacer(1, 6))
     else:
-        story.append(Paragraph("No plan generated.", normal_style))
+        story.append(rl.Paragraph("No plan generated.", normal_style))
 
     doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False)
+def build_excel_export(group_rows, oa_scores, oa_total, oa_max, oa_pct):
+    """
+    Build the Excel workbook (Group Impact, OA Summary, OA Details sheets).
+    Cached on its inputs (group_rows is a tuple of (#, *GROUP_COLUMNS)
+    rows); returns the workbook as bytes.
+    """
+    group_df = pd.DataFrame(list(group_rows), columns=["#", *GROUP_COLUMNS]).set_index("#")
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        group_df.to_excel(writer, sheet_name="Group Impact")
+        oa_summary_df = pd.DataFrame({
+            "Metric": ["Total OA score", "Max OA score", "Percent of max"],
+            "Value": [oa_total, oa_max, oa_pct],
+        })
+        oa_details_df = pd.DataFrame({
+            "Question": list(OA_QUESTIONS),
+            "Score": list(oa_scores),
+        })
+        oa_summary_df.to_excel(writer, sheet_name="OA Summary", index=False)
+        oa_details_df.to_excel(writer, sheet_name="OA Details", index=False)
+    return buffer.getvalue()
 
 # ------------- STREAMLIT APP -------------
 
@@ -453,8 +1048,7 @@ st.set_page_config(
 # --- Custom colors: pink bars + blue headings ---
 # --- Custom colors: dark theme + pink/blue accents ---
 # --- Custom dark theme + colors ---
-st.markdown(
-    """
+APP_CSS = """
     <style>
     /* ---------- Top header bar (very top of page) ---------- */
     [data-testid="stHeader"] {
@@ -586,9 +1180,11 @@ st.markdown(
     }
 
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+"""
+
+# Re-sent on every run: Streamlit drops elements a rerun does not emit,
+# so a once-per-session guard would lose the styling after the first rerun.
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 
 st.title("Change Impact Assessment Tool")
@@ -639,18 +1235,18 @@ st.markdown(
     "Rate each item from **1 (low impact)** to **5 (high impact)** based on the characteristics of this change."
 )
 
-cc_answers = {}
-
-for i, q in enumerate(CC_QUESTIONS, start=1):
-    cc_answers[f"CC_{i}"] = st.slider(
-        f"{i}) {q}",
+# Edits inside a form only rerun the script when the form is submitted.
+with st.form("cc_form"):
+    cc_scores = score_editor(
+        CC_QUESTIONS,
+        item_label="Question",
+        default=3,
         min_value=1,
         max_value=5,
-        value=3,
-        step=1,
+        key="cc_editor",
     )
-
-cc_total, cc_max, cc_pct = compute_cc_score(cc_answers)
+    st.form_submit_button("Update Change Characteristics")
+cc_total, cc_max, cc_pct = compute_cc_score(cc_scores)
 
 st.subheader("Change Characteristics summary")
 st.write(f"Total CC score: **{cc_total}** out of {cc_max}")
@@ -667,18 +1263,17 @@ st.markdown(
     "based on how the organization currently operates."
 )
 
-oa_answers = {}
-
-for i, q in enumerate(OA_QUESTIONS, start=1):
-    oa_answers[f"OA_{i}"] = st.slider(
-        f"{i}) {q}",
+with st.form("oa_form"):
+    oa_scores = score_editor(
+        OA_QUESTIONS,
+        item_label="Question",
+        default=3,
         min_value=1,
         max_value=5,
-        value=3,
-        step=1,
+        key="oa_editor",
     )
-
-oa_total, oa_max, oa_pct = compute_oa_score(oa_answers)
+    st.form_submit_button("Update Organizational Attributes")
+oa_total, oa_max, oa_pct = compute_oa_score(oa_scores)
 
 st.subheader("Organizational Attributes summary")
 st.write(f"Total OA score: **{oa_total}** out of {oa_max}")
@@ -714,75 +1309,77 @@ groups_data = []
 for i in range(int(num_groups)):
     st.subheader(f"Group {i + 1}")
     with st.expander(f"Details for group {i + 1}", expanded=True if i == 0 else False):
-        g_name = st.text_input(
-            "Group name",
-            key=f"group_name_{i}",
-            placeholder="Example: Customer Service, Finance, IT Operations"
-        )
-        g_employees = st.number_input(
-            "Number of employees in this group",
-            min_value=0,
-            value=0,
-            step=1,
-            key=f"group_employees_{i}",
-        )
-
-        st.markdown("### Impact on aspects (0–5)")
-        aspect_scores = {}
-        for aspect in GROUP_ASPECTS:
-            aspect_scores[aspect] = st.slider(
-                aspect,
+        with st.form(f"group_form_{i}"):
+            g_name = st.text_input(
+                "Group name",
+                key=f"group_name_{i}",
+                placeholder="Example: Customer Service, Finance, IT Operations"
+            )
+            g_employees = st.number_input(
+                "Number of employees in this group",
                 min_value=0,
-                max_value=5,
                 value=0,
                 step=1,
-                key=f"group_{i}_{aspect}",
+                key=f"group_employees_{i}",
             )
 
+            st.markdown("### Impact on aspects (0–5)")
+            aspect_values = score_editor(
+                GROUP_ASPECTS,
+                item_label="Aspect",
+                default=0,
+                min_value=0,
+                max_value=5,
+                key=f"group_{i}_aspects",
+            )
+            st.form_submit_button(f"Update group {i + 1}")
+
+        # Scores stay in GROUP_ASPECTS order, so compute_group_impact
+        # can build its score matrix without per-aspect lookups.
         groups_data.append({
             "name": g_name,
             "employees": g_employees,
-            "aspects": aspect_scores,
+            "aspect_scores": aspect_values,
         })
 
 group_df = compute_group_impact(groups_data)
+# Formatted once; Section 5 slices its top-5 table from this copy.
+impact_display = None if group_df.empty else format_impact_table(group_df)
 
 st.subheader("Group impact summary")
 if group_df.empty:
     st.info("Fill in at least one group with some non-zero impact scores to see results.")
 else:
-    styled_group_df = style_impact_table(group_df)
     # Using st.table instead of st.dataframe for perfect color control
-    st.table(styled_group_df)
+    st.table(impact_display)
 
     # ---------- EXCEL EXPORT (Group Impact + OA) ----------
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine="openpyxl") as writer:
-        group_df.to_excel(writer, sheet_name="Group Impact")
-        oa_summary_df = pd.DataFrame({
-            "Metric": ["Total OA score", "Max OA score", "Percent of max"],
-            "Value": [oa_total, oa_max, oa_pct],
-        })
-        oa_details_df = pd.DataFrame({
-            "Question": OA_QUESTIONS,
-            "Score": list(oa_answers.values()),
-        })
-        oa_summary_df.to_excel(writer, sheet_name="OA Summary", index=False)
-        oa_details_df.to_excel(writer, sheet_name="OA Details", index=False)
-    excel_buffer.seek(0)
-
-    excel_filename = (
-    f"{project_name.strip().replace(' ', '_')}_impact_results.xlsx"
-    if project_name else
-    "impact_results.xlsx"
-)
+    # Only built on request so slider changes don't re-serialize the workbook.
+    excel_inputs = dict(
+        group_rows=tuple(group_df.itertuples(name=None)),
+        oa_scores=oa_scores,
+        oa_total=oa_total,
+        oa_max=oa_max,
+        oa_pct=oa_pct,
+    )
+    if st.button("Prepare Excel export"):
+        st.session_state["excel_export"] = (excel_inputs, build_excel_export(**excel_inputs))
+
+    # Only offered while the workbook still matches the current inputs
+    excel_export = st.session_state.get("excel_export")
+    if excel_export and excel_export[0] == excel_inputs:
+        excel_filename = (
+            f"{project_name.strip().replace(' ', '_')}_impact_results.xlsx"
+            if project_name else
+            "impact_results.xlsx"
+        )
 
-st.download_button(
-    label="Download impact results as Excel",
-    data=excel_buffer,
-    file_name=excel_filename,
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-)
+        st.download_button(
+            label="Download impact results as Excel",
+            data=excel_export[1],
+            file_name=excel_filename,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
 
 
 st.markdown("---")
@@ -800,20 +1397,18 @@ with col_a:
 
 with col_b:
     st.subheader("Top impacted groups")
-    if not group_df.empty:
-        top_groups = group_df.sort_values(
-            by="Degree of impact (0-5)",
-            ascending=False
-        ).head(5)
-        top_display = top_groups[["Group name", "Employees", "Degree of impact (0-5)"]]
-        styled_top = style_impact_table(top_display)
+    if impact_display is not None:
+        # Rank on the numeric column, then take the already formatted rows
+        top_index = group_df["Degree of impact (0-5)"].nlargest(5).index
+        top_display = impact_display.loc[top_index, ["Group name", "Employees", "Degree of impact (0-5)"]]
         # Using st.table instead of st.dataframe for perfect color control
-        st.table(styled_top)
+        st.table(top_display)
     else:
         st.write("No group impact data yet.")
 
 # PDF summary (OA + Group Impact) – SUMMARY-ONLY PDF
-pdf_buffer = build_pdf_summary(
+# Only built on request so slider changes don't pay for ReportLab layout.
+pdf_inputs = dict(
     project_name=project_name,
     sponsor_name=sponsor_name,
     org_name=org_name,
@@ -825,26 +1420,29 @@ pdf_buffer = build_pdf_summary(
     oa_total=oa_total,
     oa_max=oa_max,
     oa_pct=oa_pct,
-    cc_answers=cc_answers,
-    oa_answers=oa_answers,
-    group_df=group_df,
-)
-
-# Convert buffer to raw bytes for Streamlit download
-pdf_bytes = pdf_buffer.getvalue()
-
-summary_filename = (
-    f"{project_name.strip().replace(' ', '_')}_impact_summary.pdf"
-    if project_name else
-    "impact_summary.pdf"
+    cc_scores=cc_scores,
+    oa_scores=oa_scores,
+    group_rows=tuple(group_df.itertuples(index=False, name=None)),
 )
+if st.button("Generate PDF Summary"):
+    st.session_state["pdf_export"] = (pdf_inputs, build_pdf_summary(**pdf_inputs))
+
+# The PDF is stored with the inputs it was built from and only offered
+# while they still match, so edits never download a stale summary.
+pdf_export = st.session_state.get("pdf_export")
+if pdf_export and pdf_export[0] == pdf_inputs:
+    summary_filename = (
+        f"{project_name.strip().replace(' ', '_')}_impact_summary.pdf"
+        if project_name else
+        "impact_summary.pdf"
+    )
 
-st.download_button(
-    label="Download PDF Summary",
-    data=pdf_bytes,
-    file_name=summary_filename,
-    mime="application/pdf"
-)
+    st.download_button(
+        label="Download PDF Summary",
+        data=pdf_export[1],
+        file_name=summary_filename,
+        mime="application/pdf"
+    )
 
 st.markdown(
     """
@@ -886,9 +1484,9 @@ oa_impacts = {
         {
             "id": i,
             "question": q,
-            "score": oa_answers.get(f"OA_{i}", None),
+            "score": score,
         }
-        for i, q in enumerate(OA_QUESTIONS, start=1)
+        for i, (q, score) in enumerate(zip(OA_QUESTIONS, oa_scores), start=1)
     ],
 }
 
@@ -901,38 +1499,102 @@ project_info = {
     "description": project_desc,
 }
 
+use_batch = st.checkbox(
+    "Queue plan via Batch API (cheaper, up to 24h)",
+    help="Sends the plan requests as an OpenAI batch job at half the cost. "
+         "The plan appears here once the batch has finished.",
+)
+
+reuse_similar = st.checkbox(
+    "Reuse a previous plan for near-identical inputs",
+    help="Compares these inputs with plans generated earlier in this session and "
+         "reuses a plan when they are almost the same, instead of generating a new one.",
+)
+
 # Button to generate the plan
 if st.button("Generate AI Change Plan"):
-    with st.spinner("Generating change plan..."):
-        plan = generate_change_plan_with_gpt(
+    if use_batch:
+        batch_job = submit_change_plan_batch(
             project_info=project_info,
             group_impacts=group_impacts,
             oa_impacts=oa_impacts,
         )
+        if batch_job:
+            st.session_state["plan_batch"] = batch_job
+    else:
+        # Stream the plan into a temporary placeholder; the saved plan is
+        # rendered below once generation finishes.
+        plan_placeholder = st.empty()
+        with st.spinner("Generating change plan..."):
+            plan, reused = generate_change_plan_with_gpt(
+                project_info=project_info,
+                group_impacts=group_impacts,
+                oa_impacts=oa_impacts,
+                placeholder=plan_placeholder,
+                reuse_similar=reuse_similar,
+            )
+        plan_placeholder.empty()
 
-    if plan:
-        st.session_state["change_plan"] = plan
-        st.success("Change plan generated.")
+        if plan:
+            st.session_state["change_plan"] = plan
+            if reused:
+                st.info("Reused a plan generated for near-identical inputs.")
+            else:
+                st.success("Change plan generated.")
+
+# A queued batch plan is only checked on request, so other reruns don't
+# wait on the Batch API.
+if st.session_state.get("plan_batch"):
+    batch_job = st.session_state["plan_batch"]
+    batch_status, batch_plan, batch_error = batch_job.get("status", "submitted"), None, None
+
+    if st.button("Check batch status"):
+        try:
+            batch_status, batch_plan, batch_error = collect_change_plan_batch(batch_job)
+            batch_job["status"] = batch_status
+        except Exception as e:
+            st.error(f"Error checking OpenAI batch: {e}")
+
+    if batch_plan is not None:
+        st.session_state["change_plan"] = batch_plan
+        del st.session_state["plan_batch"]
+        st.success("Queued change plan is ready.")
+    elif batch_error:
+        del st.session_state["plan_batch"]
+        st.error(f"Error generating the queued change plan: {batch_error}")
+    elif batch_status in ("failed", "expired", "cancelled"):
+        del st.session_state["plan_batch"]
+        st.error(f"The queued change plan batch {batch_status}. Please generate it again.")
+    else:
+        st.info(
+            f"Change plan queued (batch status: {batch_status}). "
+            "Batches can take up to 24 hours to finish; use Check batch status to refresh."
+        )
 
 # If we have a saved plan, display it and offer PDF download
 if st.session_state.get("change_plan"):
     st.markdown("### Recommended Change Plan")
     st.write(st.session_state["change_plan"])
 
-    # Build PDF of the AI change plan
-    plan_pdf_buffer = build_change_plan_pdf(project_info, st.session_state["change_plan"])
-    plan_pdf_bytes = plan_pdf_buffer.getvalue()
-
-    # Dynamic filename using project name
-    plan_filename = (
-        f"{project_name.strip().replace(' ', '_')}_change_plan.pdf"
-        if project_name else
-        "change_plan.pdf"
-    )
+    # Build PDF of the AI change plan only on request. It is stored with the
+    # project info and plan it was built from, and only offered while both
+    # still match (a new plan or edited project details hide it).
+    plan_pdf_inputs = (project_info, st.session_state["change_plan"])
+    if st.button("Prepare Change Plan PDF"):
+        st.session_state["plan_pdf_export"] = (plan_pdf_inputs, build_change_plan_pdf(*plan_pdf_inputs))
+
+    plan_pdf_export = st.session_state.get("plan_pdf_export")
+    if plan_pdf_export and plan_pdf_export[0] == plan_pdf_inputs:
+        # Dynamic filename using project name
+        plan_filename = (
+            f"{project_name.strip().replace(' ', '_')}_change_plan.pdf"
+            if project_name else
+            "change_plan.pdf"
+        )
 
-    st.download_button(
-        label="Download Change Plan as PDF",
-        data=plan_pdf_bytes,
-        file_name=plan_filename,
-        mime="application/pdf",
-    )
\ No newline at end of file
+        st.download_button(
+            label="Download Change Plan as PDF",
+            data=plan_pdf_export[1],
+            file_name=plan_filename,
+            mime="application/pdf",
+        )
\ No newline at end of file